@@ -1,25 +1,106 @@
-import speech_recognition as sr
-from gtts import gTTS
-import pygame
+import json
+import math
+from array import array
+import struct
 import os
 import re
 import time
 import tempfile
-from threading import Thread, Event
+import subprocess
+import hashlib
+import io
+import uuid
+import wave
+from threading import Thread, Event, Lock, get_ident
+from concurrent.futures import ThreadPoolExecutor, wait
 import queue
+import heapq
+from types import MappingProxyType
+
+# Heavy libraries, imported on a background thread by AdvancedVoiceBible._preload
+sr = None
+gTTS = None
+pygame = None
+AudioSegment = None
+vosk = None
+
+CACHE_SAMPLE_RATE = 16000  # Mono narration needs no more than this
+
+WAKE_WORDS = frozenset({"bible", "scripture", "word"})
+
+# Built-in verses (replace with your actual data source)
+BIBLE_VERSES = MappingProxyType({
+    "genesis1:1": "In the beginning, God created the heavens and the earth...",
+    "john3:16": "For God so loved the world that he gave his only Son...",
+    "psalm23:1": "The Lord is my shepherd, I shall not want..."
+})
 
 class AdvancedVoiceBible:
+    # Command vocabulary, matched against the words and word pairs of an utterance
+    _VERSE_RE = re.compile(r"(?:read|say|play)\s+([\w\s:]+)")
+    _PAUSE_WORDS = frozenset({"pause", "paused"})
+    _RESUME_WORDS = frozenset({"resume", "continue"})
+    _SLEEP_WORDS = frozenset({"sleep", "stop listening"})
+    _STOP_WORDS = frozenset({"stop"})
+    _FASTER_WORDS = frozenset({"faster", "speed up"})
+    _SLOWER_WORDS = frozenset({"slower", "slow down"})
+    
+    # Spoken numbers as Vosk transcribes them ("john three sixteen")
+    _UNIT_WORDS = {word: value for value, word in enumerate((
+        "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+        "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen",
+        "eighteen", "nineteen"
+    ))}
+    _TENS_WORDS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+                   "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+    _REFERENCE_FILLER = frozenset({"chapter", "verse"})
+    _REFERENCE_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+    
+    # Common mishearings, fixed in a single regex pass
+    _MISHEARINGS = {"first": "fast", "jeans": "genesis", "sweet": "read"}
+    _MISHEARING_RE = re.compile(r"\b(" + "|".join(_MISHEARINGS) + r")\b")
+    
     def __init__(self):
+        self.wake_words = WAKE_WORDS
+        self._audio_ready = Event()  # Mixer is up; set before the speech engines load
+        self._audio_error = None
+        self._preloaded = Event()
+        self._preload_error = None
+        
         # Audio engine setup
-        pygame.mixer.init()
         self.audio_queue = queue.Queue()
         self.playback_event = Event()
         self.playback_event.set()  # Start with playback enabled
+        self._cleanup_q = queue.Queue()
+        Thread(target=self._cleanup_worker, daemon=True).start()
         
-        # Voice recognition
-        self.recognizer = sr.Recognizer()
-        self.recognizer.pause_threshold = 1.0  # Longer pauses between phrases
-        self.wake_words = {"bible", "scripture", "word"}
+        # Speech synthesis runs off the caller thread
+        self._tts_pool = ThreadPoolExecutor(max_workers=2)
+        self._speech_lock = Lock()
+        self._speech_generation = 0  # Bumped by priority messages to drop stale speech
+        self._last_speech = None
+        
+        # Voice recognition endpointing per state; the recognizer itself is created by _preload
+        self.pause_thresholds = {
+            "SLEEP": 0.3,
+            "ACTIVE": 0.5,  # Allow a short breath inside "read john 3 16"
+            "PAUSED": 0.3
+        }
+        self.phrase_limits = {  # Longest phrase recorded per state, in seconds
+            "SLEEP": 2,
+            "ACTIVE": 5,
+            "PAUSED": 2
+        }
+        self._capture_error = None
+        self._last_calibration = 0.0
+        self._unknown_streak = 0     # Consecutive unintelligible phrases
+        self.recalibrate_after = 3   # Unknown streak that suggests a stale energy threshold
+        self.recalibrate_interval = 60  # Minimum seconds between recalibrations
+        
+        # Microphone capture runs on its own thread and feeds phrases to the STT worker
+        self._stt_q = queue.Queue(maxsize=4)
+        self._mute_until = 0.0  # Monotonic time the current prompt finishes playing
+        self._prompt_count = 0
         
         # App states
         self.states = {
@@ -29,76 +110,564 @@ class AdvancedVoiceBible:
         }
         self.current_state = self.states["SLEEP"]
         
+        # Checked in order; the first matching handler wins
+        self._command_handlers = (
+            (self._PAUSE_WORDS, self._on_pause),
+            (self._RESUME_WORDS, self._on_resume),
+            (self._SLEEP_WORDS, self._on_sleep),
+            (self._STOP_WORDS, self._on_stop),
+            (self._FASTER_WORDS, self._on_faster),
+            (self._SLOWER_WORDS, self._on_slower)
+        )
+        
         # Audio settings
         self.speech_rate = 1.0  # Normal speed
         self.volume = 0.7       # Default volume
         
-        # Initialize components
+        # Initialize components; heavy libraries load in the background
+        Thread(target=self._preload, daemon=True).start()
         self._init_audio_worker()
         self._load_bible_data()
+        self._init_tts_cache()
+    
+    def _preload(self):
+        """Import speech and audio libraries and set up the engines that need them"""
+        global sr, gTTS, pygame, AudioSegment, vosk
+        try:
+            from gtts import gTTS
+            import pygame
+            from pydub import AudioSegment
+            
+            # Mixer runs at the cache's rate and layout so cached audio needs no conversion
+            pygame.mixer.init(frequency=CACHE_SAMPLE_RATE, channels=1)
+            # Channel 0 is kept free for preloaded prompts
+            pygame.mixer.set_reserved(1)
+            self._prompt_channel = pygame.mixer.Channel(0)
+            self._earcon_fail = self._make_earcon(frequency=330, duration=0.1)
+        except Exception as e:
+            print(f"Startup error: {e}")
+            self._audio_error = self._preload_error = e
+            self._audio_ready.set()
+            self._preloaded.set()
+            return
+        # Playback needs nothing below, so startup prompts don't wait for the speech model
+        self._audio_ready.set()
         
+        try:
+            import speech_recognition as sr
+            import vosk
+            
+            self.recognizer = sr.Recognizer()
+            # Short endpointing: commands are a few words, wake words just one
+            self.recognizer.pause_threshold = 0.3
+            self.recognizer.non_speaking_duration = 0.3
+            self.recognizer.phrase_threshold = 0.15
+            # Threshold is pinned by _calibrate instead of being re-estimated on every phrase
+            self.recognizer.dynamic_energy_threshold = False
+            self._init_local_stt()
+            self._init_wake_engine()
+            
+            # One microphone for the whole session
+            if self._porcupine is not None:
+                # Porcupine consumes fixed-size 16 kHz frames straight from the mic stream
+                self.microphone = sr.Microphone(sample_rate=self._porcupine.sample_rate,
+                                                chunk_size=self._porcupine.frame_length)
+            else:
+                self.microphone = sr.Microphone()
+        except Exception as e:
+            print(f"Startup error: {e}")
+            self._preload_error = e
+        finally:
+            self._preloaded.set()
+    
+    def _make_earcon(self, frequency, duration):
+        """Synthesize a short tone as a pygame Sound in the mixer's own format"""
+        rate, _, channels = pygame.mixer.get_init()
+        count = int(rate * duration)
+        ramp = max(1, count // 10)  # Fade in/out to avoid clicks
+        frames = (
+            int(8000 * math.sin(2 * math.pi * frequency * i / rate) * min(1.0, i / ramp, (count - i) / ramp))
+            for i in range(count)
+        )
+        samples = array("h", (value for value in frames for _ in range(channels)))
+        sound = pygame.mixer.Sound(buffer=samples.tobytes())
+        sound.set_volume(self.volume)
+        return sound
+    
+    def _wait_ready(self, audio_only=False):
+        """Block until _preload has finished, or only its playback part; re-raises its failure"""
+        if audio_only:
+            self._audio_ready.wait()
+            error = self._audio_error
+        else:
+            self._preloaded.wait()
+            error = self._preload_error
+        if error is not None:
+            raise RuntimeError("Speech and audio libraries failed to load") from error
+    
     def _init_audio_worker(self):
         """Background thread for smooth audio playback"""
+        self._audio_wakeup = Event()  # Set on stop, pause or resume request
+        self._music_stopped = Event()
+        self._music_active = Event()  # Set while speech is audibly playing
+        
+        self._audio_idle = Event()    # Set while no speech is queued or playing
+        self._audio_idle.set()
+        self._prompt_tracks = set()   # Queued files that speak our own prompt text
+        
         def audio_worker():
+            self._wait_ready(audio_only=True)
             while True:
                 audio_file = self.audio_queue.get()
                 if audio_file == "STOP":
                     break
-                    
+                
+                self.playback_event.wait()  # Paused before this track started
+                length = self._track_length(audio_file)
                 pygame.mixer.music.load(audio_file)
                 pygame.mixer.music.set_volume(self.volume)
+                self._audio_wakeup.clear()
+                self._music_stopped.clear()
                 pygame.mixer.music.play()
+                self._music_active.set()
+                deadline = time.monotonic() + length
+                muted = audio_file in self._prompt_tracks
+                if muted:
+                    # Same muting as the prompt channel; "Going to sleep" must not barge in
+                    self._prompt_tracks.discard(audio_file)
+                    self._prompt_count += 1
+                    self._mute_until = deadline
                 
-                # Wait for playback to complete or interruption
-                while pygame.mixer.music.get_busy():
+                # Sleep until the track's known end; stop and pause requests wake us early
+                while self._audio_wakeup.wait(timeout=max(0.0, deadline - time.monotonic())):
+                    self._audio_wakeup.clear()
+                    if self._music_stopped.is_set():
+                        break
                     if not self.playback_event.is_set():
+                        paused_at = time.monotonic()
                         pygame.mixer.music.pause()
-                        self.playback_event.wait()  # Wait for resume
+                        self._music_active.clear()
+                        while not (self.playback_event.is_set() or self._music_stopped.is_set()):
+                            self._audio_wakeup.wait()  # Wait for resume or stop
+                            self._audio_wakeup.clear()
+                        if self._music_stopped.is_set():
+                            break
                         pygame.mixer.music.unpause()
-                    time.sleep(0.1)
+                        self._music_active.set()
+                        deadline += time.monotonic() - paused_at
+                        if muted:
+                            self._mute_until = deadline
+                self._music_active.clear()
+                with self._speech_lock:
+                    if self.audio_queue.empty():
+                        self._audio_idle.set()
                 
                 # Clean up file after playback
                 self._safe_remove(audio_file)
         
         Thread(target=audio_worker, daemon=True).start()
     
+    def _track_length(self, path):
+        """Playing time of an audio file in seconds"""
+        if path.endswith(".wav"):
+            with wave.open(path, "rb") as wav:  # Header only; cached audio is always WAV
+                return wav.getnframes() / wav.getframerate()
+        return pygame.mixer.Sound(path).get_length()  # Stream segments are short MP3s
+    
+    def _init_local_stt(self):
+        """Offline Vosk model used instead of the Google Web Speech API"""
+        vosk.SetLogLevel(-1)
+        model_path = os.environ.get("VOSK_MODEL_PATH")
+        self._stt_model = vosk.Model(model_path) if model_path else vosk.Model(lang="en-us")
+        self._stt_rate = 16000
+        
+        # Small grammars make wake/resume detection fast and hard to mishear
+        self._stt_grammars = {
+            "wake": sorted(self.wake_words) + ["[unk]"],
+            "resume": sorted(self._RESUME_WORDS | self.wake_words) + ["[unk]"],
+            # While our own speech plays, only interruptions are listened for
+            "barge_in": sorted(self._PAUSE_WORDS | self._STOP_WORDS | self._SLEEP_WORDS) + ["[unk]"],
+            "command": None  # Full vocabulary
+        }
+        self._stt_recognizers = {}
+    
+    def _calibrate(self, source, duration):
+        """Measure ambient noise and pin the recognizer's energy threshold"""
+        self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+        self._last_calibration = time.monotonic()
+        self._unknown_streak = 0
+    
+    def transcribe(self, audio, mode="command"):
+        """Transcribe captured AudioData locally; raises sr.UnknownValueError if nothing was heard"""
+        recognizer = self._stt_recognizers.get(mode)
+        if recognizer is None:
+            grammar = self._stt_grammars[mode]
+            if grammar is None:
+                recognizer = vosk.KaldiRecognizer(self._stt_model, self._stt_rate)
+            else:
+                recognizer = vosk.KaldiRecognizer(self._stt_model, self._stt_rate, json.dumps(grammar))
+            self._stt_recognizers[mode] = recognizer
+        
+        pcm = audio.get_raw_data(convert_rate=self._stt_rate, convert_width=2)
+        for start in range(0, len(pcm), 4000):
+            recognizer.AcceptWaveform(pcm[start:start + 4000])
+        
+        # FinalResult also resets the recognizer for the next phrase
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        text = text.replace("[unk]", "").strip()
+        if not text:
+            if mode != "barge_in":  # Our own playback says nothing about the threshold
+                self._unknown_streak += 1
+            raise sr.UnknownValueError()
+        self._unknown_streak = 0
+        return text
+    
+    def _init_wake_engine(self):
+        """Porcupine keyword spotter for the sleep state, when configured"""
+        # "bible" is not a built-in Porcupine keyword, so a custom .ppn file is required
+        access_key = os.environ.get("PICOVOICE_ACCESS_KEY")
+        keyword_path = os.environ.get("PORCUPINE_KEYWORD_PATH")
+        self._porcupine = None
+        if access_key and keyword_path:
+            import pvporcupine  # Optional dependency, only needed when configured
+            self._porcupine = pvporcupine.create(access_key=access_key, keyword_paths=[keyword_path])
+    
+    def _wait_for_wake_word(self, source):
+        """Block on raw microphone frames until Porcupine detects the wake word"""
+        frame_length = self._porcupine.frame_length
+        while True:
+            data = source.stream.read(frame_length)
+            pcm = struct.unpack_from("h" * frame_length, data)
+            if self._porcupine.process(pcm) >= 0:
+                return
+    
     def _load_bible_data(self):
         """Load Bible verses (replace with your actual data source)"""
-        self.bible_data = {
-            "genesis1:1": "In the beginning, God created the heavens and the earth...",
-            "john3:16": "For God so loved the world that he gave his only Son...",
-            "psalm23:1": "The Lord is my shepherd, I shall not want..."
-        }
+        # Normalize references once so lookups match the spoken form directly
+        self.bible_data = {ref.replace(" ", "").lower(): verse for ref, verse in BIBLE_VERSES.items()}
     
-    def speak(self, text, interruptible=True, priority=False):
-        """Convert text to speech and queue for playback"""
-        if interruptible and pygame.mixer.music.get_busy():
-            pygame.mixer.music.stop()
-            
+    def _init_tts_cache(self):
+        """Persistent speech cache so repeated phrases skip the gTTS round trip"""
+        self._tts_cache_dir = os.path.join(tempfile.gettempdir(), "voicebible_tts")
+        os.makedirs(self._tts_cache_dir, exist_ok=True)
+        
+        # Fixed phrases the app says over and over
+        self.prompts = (
+            "Application ready. Say 'Bible' to begin.",
+            "Bible application ready",
+            "How can I help you?",
+            "Playback paused",
+            "Resuming playback",
+            "Going to sleep",
+            "Playback stopped",
+            "Verse not found",
+            "Command not recognized",
+            "Returning to sleep"
+        )
+        
+        self._prompt_sounds = {}  # (prompt text, speech rate) -> decoded pygame Sound
+        
+        def prewarm():
+            self._wait_ready(audio_only=True)
+            verses = [f"Reading {ref}. {verse}" for ref, verse in self.bible_data.items()]
+            try:
+                for text in self.prompts:
+                    self._load_prompt_sound(text, 1.0)
+                for text in verses:
+                    self.text_to_speech(text)
+            except Exception as e:
+                print(f"TTS prewarm failed: {e}")
+        
+        Thread(target=prewarm, daemon=True).start()
+    
+    def _load_prompt_sound(self, text, rate):
+        """Decode a prompt at the given speech rate into memory"""
+        self._wait_ready(audio_only=True)
+        sound = pygame.mixer.Sound(self._apply_rate(self.text_to_speech(text), rate))
+        sound.set_volume(self.volume)
+        self._prompt_sounds[(text, rate)] = sound
+    
+    def _cache_path(self, text):
+        key = hashlib.sha1(f"{text}|en|0".encode()).hexdigest()
+        return os.path.join(self._tts_cache_dir, key + ".wav")
+    
+    def _store_cached(self, path, mp3_data):
+        # Decode to PCM once here so cached playback never pays for MP3 decoding
+        audio = AudioSegment.from_file(io.BytesIO(mp3_data), format="mp3")
+        # Write to a private temp name so concurrent callers never see a partial file
+        tmp_path = f"{path}.{get_ident()}.tmp"
+        audio.set_channels(1).set_frame_rate(CACHE_SAMPLE_RATE).export(tmp_path, format="wav")
+        os.replace(tmp_path, path)
+    
+    def text_to_speech(self, text):
+        """Return path to cached audio of the text, synthesizing only on cache miss"""
+        path = self._cache_path(text)
+        if not os.path.exists(path):
+            tts = gTTS(text=text, lang='en', slow=False)
+            self._store_cached(path, b"".join(tts.stream()))
+        return path
+    
+    def _stream_speech(self, text):
+        """Yield playable MP3 segments as soon as gTTS delivers each one"""
+        path = self._cache_path(text)
+        if os.path.exists(path):
+            yield path
+            return
+        
+        # gTTS fetches long text in parts; each part is a complete MP3 we can play right away
+        chunks = []
         tts = gTTS(text=text, lang='en', slow=False)
-        temp_file = os.path.join(tempfile.gettempdir(), f"bible_{time.time()}.mp3")
-        tts.save(temp_file)
+        for chunk in tts.stream():
+            chunks.append(chunk)
+            segment = os.path.join(tempfile.gettempdir(), f"bible_{uuid.uuid4().hex}.mp3")
+            with open(segment, 'wb') as f:
+                f.write(chunk)
+            yield segment
         
-        if priority:
-            # Clear queue for high-priority messages
-            while not self.audio_queue.empty():
-                old_file = self.audio_queue.get()
+        self._store_cached(path, b"".join(chunks))
+    
+    def _apply_rate(self, path, rate):
+        """Time-stretch audio with ffmpeg's atempo filter; cached audio keeps its stretched variant"""
+        if rate == 1.0:
+            return path
+        
+        stem, ext = os.path.splitext(path)
+        if os.path.dirname(path) == self._tts_cache_dir:
+            stretched = f"{stem}_{rate}{ext}"
+            if os.path.exists(stretched):
+                return stretched
+            output = f"{stretched}.{get_ident()}.tmp"
+        else:
+            stretched = output = os.path.join(tempfile.gettempdir(), f"bible_{uuid.uuid4().hex}{ext}")
+        
+        try:
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", path,
+                 "-filter:a", f"atempo={rate}", "-f", ext.lstrip("."), output],
+                check=True
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Missing or failing ffmpeg: play at normal speed rather than not at all
+            print(f"Speed change failed: {e}")
+            self._cleanup_q.put(output)  # Partial output, if any
+            return path
+        if output != stretched:
+            os.replace(output, stretched)
+        else:
+            self._safe_remove(path)  # Unstretched stream segment is no longer needed
+        return stretched
+    
+    def _drop_pending_speech(self):
+        """Discard queued and in-flight speech segments of earlier messages"""
+        with self._speech_lock:
+            self._speech_generation += 1
+            while True:
+                try:
+                    old_file = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._prompt_tracks.discard(old_file)
                 self._safe_remove(old_file)
+            if not self._music_active.is_set():
+                self._audio_idle.set()
+    
+    def interrupt(self):
+        """Stop what is playing and drop the rest of the interrupted message"""
+        # Long text plays as several segments; none of them should play after an interruption
+        self._drop_pending_speech()
+        self.stop_playback()
+    
+    def stop_playback(self):
+        """Stop the current track and any prompt, waking the audio worker for the next track"""
+        if not self._audio_ready.is_set() or self._audio_error is not None:
+            return  # Nothing can be playing yet
+        self._prompt_channel.stop()
+        pygame.mixer.music.stop()  # Also stops paused music, which get_busy() doesn't report
+        self._music_stopped.set()
+        self._audio_wakeup.set()
+    
+    def speak_prompt(self, text, interruptible=True, overlay=False):
+        """Play a fixed prompt straight from memory on the muted prompt channel
         
-        self.audio_queue.put(temp_file)
+        Overlay prompts acknowledge a state change and play over speech without stopping it.
+        """
+        rate = self.speech_rate
+        sound = self._prompt_sounds.get((text, rate))
+        if not interruptible:
+            # Non-interruptible prompts keep their place in the playback queue
+            self.speak(text, interruptible=False, prompt=True)
+            if sound is None and rate != 1.0 and text in self.prompts:
+                self._tts_pool.submit(self._load_prompt_sound, text, rate)  # Ready next time
+            return
+        if sound is not None:
+            self._play_prompt_sound(sound, overlay)
+            return
+        
+        # Not in memory yet: load it rather than queue it, since queued speech may be paused
+        self._tts_pool.submit(self._play_loaded_prompt, text, rate, overlay, self._speech_generation)
     
-    def _safe_remove(self, filepath):
-        """Safely remove audio files with retries"""
+    def _play_loaded_prompt(self, text, rate, overlay, generation):
+        """Pool job: load a prompt that is not in memory yet, then play it"""
         try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except:
-            time.sleep(0.5)
+            self._load_prompt_sound(text, rate)
+        except Exception as e:
+            print(f"Prompt load failed: {e}")
+            if not overlay and generation == self._speech_generation:
+                # Overlays are skipped: queued behind paused speech they would come too late
+                self.speak(text, interruptible=True, prompt=True)
+            return
+        if generation == self._speech_generation:  # Not interrupted while loading
+            self._play_prompt_sound(self._prompt_sounds[(text, rate)], overlay)
+    
+    def signal_failure(self):
+        """Short local earcon for "not understood", instead of a spoken reply"""
+        self._play_prompt_sound(self._earcon_fail)
+    
+    def _play_prompt_sound(self, sound, overlay=False):
+        # Overlays only replace an earlier prompt; the speech track keeps playing
+        if not overlay:
+            self.interrupt()
+        self._prompt_channel.play(sound)
+        # Mute capture while the prompt plays; the count lets it drop phrases that overlapped
+        self._prompt_count += 1
+        self._mute_until = time.monotonic() + sound.get_length()
+    
+    def speak(self, text, interruptible=True, priority=False, prompt=False):
+        """Queue text for background synthesis and playback
+        
+        Capture stays muted while prompt text plays, so barge-in never hears our own commands.
+        """
+        previous = self._last_speech
+        if interruptible:
+            self.interrupt()
+            previous = None
+        elif priority:
+            # Clear queue for high-priority messages
+            self._drop_pending_speech()
+            previous = None
+        
+        self._last_speech = self._tts_pool.submit(
+            self._synthesize, text, previous, self._speech_generation, self.speech_rate, prompt
+        )
+    
+    def _synthesize(self, text, previous, generation, rate, prompt=False):
+        """Pool job: stream speech segments into the audio queue in request order"""
+        try:
+            self._wait_ready(audio_only=True)
+            for audio_file in self._stream_speech(text):
+                audio_file = self._apply_rate(audio_file, rate)
+                
+                # Download overlaps the previous message, but queueing waits for it
+                if previous is not None:
+                    wait([previous])
+                    previous = None
+                
+                with self._speech_lock:
+                    if generation != self._speech_generation:
+                        self._safe_remove(audio_file)
+                        return
+                    self._audio_idle.clear()
+                    if prompt:
+                        self._prompt_tracks.add(audio_file)
+                    self.audio_queue.put(audio_file)
+        except Exception as e:
+            print(f"Speech synthesis error: {e}")
+    
+    def _safe_remove(self, filepath):
+        """Hand an audio file to the cleanup thread for deletion"""
+        if os.path.dirname(filepath) == self._tts_cache_dir:
+            return  # Cached audio is kept across runs
+        self._cleanup_q.put(filepath)
+    
+    def _cleanup_worker(self):
+        """Delete played audio files, retrying ones that are still in use"""
+        retries = []  # Heap of (due time, filepath, attempts) so fresh deletions never wait
+        while True:
+            if retries and retries[0][0] <= time.monotonic():
+                _, filepath, attempts = heapq.heappop(retries)
+            else:
+                # Clamped: the retry may have come due since the check above
+                timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+                try:
+                    filepath, attempts = self._cleanup_q.get(timeout=timeout), 0
+                except queue.Empty:
+                    continue
             try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except:
+                os.unlink(filepath)
+            except FileNotFoundError:
                 pass
+            except OSError:
+                if attempts < 3:
+                    heapq.heappush(retries, (time.monotonic() + 0.5, filepath, attempts + 1))
+    
+    def _on_pause(self):
+        self.current_state = self.states["PAUSED"]
+        self.playback_event.clear()
+        self._audio_wakeup.set()
+        self.speak_prompt("Playback paused", overlay=True)
+    
+    def _on_resume(self):
+        self.current_state = self.states["ACTIVE"]
+        self.playback_event.set()
+        self._audio_wakeup.set()
+        self.speak_prompt("Resuming playback", overlay=True)
+    
+    def _on_sleep(self):
+        self.current_state = self.states["SLEEP"]
+        self.speak_prompt("Going to sleep", interruptible=True)
+    
+    def _on_stop(self):
+        self.speak_prompt("Playback stopped", interruptible=True)
+    
+    def _on_faster(self):
+        self.speech_rate = min(2.0, self.speech_rate + 0.25)
+        self.speak(f"Speed set to {self.speech_rate}x", interruptible=True)
+    
+    def _on_slower(self):
+        self.speech_rate = max(0.5, self.speech_rate - 0.25)
+        self.speak(f"Speed set to {self.speech_rate}x", interruptible=True)
+    
+    def _parse_reference(self, spoken):
+        """Turn "john three sixteen", "john 3 16" or "john 3:16" into the "john3:16" key form"""
+        book, numbers = [], []
+        current = None  # Number being assembled from words
+        
+        for word in self._REFERENCE_TOKEN_RE.findall(spoken):
+            if word == "and":
+                continue  # "one hundred and five"
+            if word in self._UNIT_WORDS:
+                value = self._UNIT_WORDS[word]
+                if current is not None and (
+                        (current >= 20 and current % 10 == 0 and value < 10)  # "twenty three"
+                        or (current >= 100 and current % 100 == 0)):          # "one hundred nineteen"
+                    current += value
+                    continue
+            elif word in self._TENS_WORDS:
+                value = self._TENS_WORDS[word]
+                if current is not None and current >= 100 and current % 100 == 0:
+                    current += value
+                    continue
+            elif word == "hundred":
+                current = (current or 1) * 100
+                continue
+            elif word.isdigit():
+                value = int(word)
+            else:
+                if current is not None:
+                    numbers.append(current)
+                    current = None
+                if word not in self._REFERENCE_FILLER:
+                    book.append(word)
+                continue
+            
+            # A number word or digits that starts a new number
+            if current is not None:
+                numbers.append(current)
+            current = value
+        
+        if current is not None:
+            numbers.append(current)
+        return "".join(book) + ":".join(str(number) for number in numbers)
     
     def process_command(self, command):
         """Execute recognized commands with proper feedback"""
@@ -106,119 +675,196 @@ class AdvancedVoiceBible:
         
         # Clean and normalize the command
         command = command.lower().strip()
-        command = command.replace(" first", " fast")  # Common mishearing fix
-        
-        # State management commands
-        if "pause" in command:
-            self.current_state = self.states["PAUSED"]
-            self.playback_event.clear()
-            self.speak("Playback paused", interruptible=True)
-            return True
-            
-        if any(word in command for word in {"resume", "continue"}):
-            self.current_state = self.states["ACTIVE"]
-            self.playback_event.set()
-            self.speak("Resuming playback", interruptible=True)
-            return True
-            
-        if any(word in command for word in {"sleep", "stop listening"}):
-            self.current_state = self.states["SLEEP"]
-            self.speak("Going to sleep", interruptible=True)
-            return True
-        
-        # Audio control commands
-        if any(word in command for word in {"faster", "speed up"}):
-            self.speech_rate = min(2.0, self.speech_rate + 0.25)
-            self.speak(f"Speed set to {self.speech_rate}x", interruptible=True)
-            return True
-            
-        if any(word in command for word in {"slower", "slow down"}):
-            self.speech_rate = max(0.5, self.speech_rate - 0.25)
-            self.speak(f"Speed set to {self.speech_rate}x", interruptible=True)
-            return True
+        command = self._MISHEARING_RE.sub(lambda m: self._MISHEARINGS[m.group(1)], command)
+        
+        words = command.split()
+        tokens = set(words).union(" ".join(pair) for pair in zip(words, words[1:]))
+        
+        # State management and audio control commands
+        for keywords, handler in self._command_handlers:
+            if tokens & keywords:
+                handler()
+                return True
         
         # Verse reading commands
-        verse_match = re.search(r"(?:read|say|play)\s+([\w\s:]+)", command)
+        verse_match = self._VERSE_RE.search(command)
         if verse_match:
-            verse_ref = verse_match.group(1).replace(" ", "").lower()
+            verse_ref = self._parse_reference(verse_match.group(1))
             if verse_ref in self.bible_data:
                 self.speak(f"Reading {verse_ref}. {self.bible_data[verse_ref]}", interruptible=True)
                 return True
             else:
-                self.speak("Verse not found", interruptible=True)
+                self.speak_prompt("Verse not found", interruptible=True)
                 return False
         
         # No valid command found
-        self.speak("Command not recognized", interruptible=True)
+        self.speak_prompt("Command not recognized", interruptible=True)
         return False
 
-    def listen_loop(self):
-        """Main listening loop with guaranteed command execution"""
-        print("Voice Bible System Ready")
-        self.speak("Application ready. Say 'Bible' to begin.", interruptible=False)
-        
-        with sr.Microphone() as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=2)
+    def _raise_capture_error(self):
+        if self._capture_error is not None:
+            raise RuntimeError("Microphone capture stopped") from self._capture_error
+    
+    def _capture_loop(self):
+        """Capture thread: report a fatal microphone failure to the STT worker"""
+        try:
+            self._capture()
+        except Exception as e:
+            print(f"Capture failed: {e}")
+            self._capture_error = e
+            self._stt_q.put((None, None))  # Stops the STT worker
+    
+    def _capture(self):
+        """Keep the microphone listening while the STT worker transcribes"""
+        # Startup prompts would be measured as room noise, so let them finish first
+        self._wait_for_silence()
+        with self.microphone as source:
+            self._calibrate(source, duration=2)
             
             while True:
                 try:
-                    state_name = list(self.states.keys())[self.current_state]
-                    print(f"\nCurrent state: {state_name}")
+                    muted = self._mute_until - time.monotonic()
+                    if muted > 0:
+                        time.sleep(muted)  # Don't record our own prompts
+                        continue
                     
-                    # SLEEP STATE
-                    if self.current_state == self.states["SLEEP"]:
-                        try:
-                            print("Listening for wake word...")
-                            audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=2)
-                            text = self.recognizer.recognize_google(audio).lower()
-                            print(f"Heard: {text}")
-                            
-                            if any(word in text for word in self.wake_words):
-                                self.current_state = self.states["ACTIVE"]
-                                self.speak("How can I help you?", interruptible=True)
-                        
-                        except (sr.WaitTimeoutError, sr.UnknownValueError):
-                            continue
+                    if (self._unknown_streak >= self.recalibrate_after
+                            and not pygame.mixer.music.get_busy()
+                            and time.monotonic() - self._last_calibration > self.recalibrate_interval):
+                        print("Recalibrating for ambient noise...")
+                        self._calibrate(source, duration=0.5)
                     
-                    # ACTIVE STATE
-                    elif self.current_state == self.states["ACTIVE"]:
-                        try:
-                            print("Waiting for command...")
-                            audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                            command = self.recognizer.recognize_google(audio).lower()
-                            print(f"Command: {command}")
-                            
-                            # Process the command
-                            if not self.process_command(command):
-                                self.speak("Please try again", interruptible=True)
-                        
-                        except sr.WaitTimeoutError:
-                            self.current_state = self.states["SLEEP"]
-                            self.speak("Returning to sleep", interruptible=True)
-                        except sr.UnknownValueError:
-                            self.speak("I didn't understand that", interruptible=True)
+                    state_name = list(self.states.keys())[self.current_state]
+                    self.recognizer.pause_threshold = self.pause_thresholds[state_name]
                     
-                    # PAUSED STATE
-                    elif self.current_state == self.states["PAUSED"]:
-                        try:
-                            print("Paused - waiting for resume...")
-                            audio = self.recognizer.listen(source, timeout=None, phrase_time_limit=2)
-                            text = self.recognizer.recognize_google(audio).lower()
-                            
-                            if any(word in text for word in {"resume", "continue"} | self.wake_words):
-                                self.current_state = self.states["ACTIVE"]
-                                self.playback_event.set()
-                                self.speak("Resuming playback", interruptible=True)
-                        
-                        except sr.UnknownValueError:
-                            continue
+                    if self.current_state == self.states["SLEEP"] and self._porcupine is not None:
+                        self._wait_for_wake_word(source)
+                        self._stt_q.put((None, False))  # Wake marker, no audio to transcribe
+                        self._stt_q.join()     # Let the worker leave SLEEP before listening again
+                        continue
+                    
+                    prompts_before = self._prompt_count
+                    playing_before = self._music_active.is_set()
+                    audio = self.recognizer.listen(source, timeout=1,
+                                                   phrase_time_limit=self.phrase_limits[state_name])
+                    if self._prompt_count != prompts_before:
+                        continue  # A prompt played while recording
+                    # Phrases overlapping speech playback may contain our own voice
+                    barge_in = playing_before or self._music_active.is_set()
+                    self._stt_q.put((audio, barge_in))
                 
+                except sr.WaitTimeoutError:
+                    continue
                 except Exception as e:
-                    print(f"System error: {e}")
-                    self.current_state = self.states["SLEEP"]
+                    print(f"Capture error: {e}")
                     time.sleep(1)
+    
+    def _wait_for_silence(self):
+        """Block until all speech requested so far has been synthesized and played"""
+        while True:
+            pending = self._last_speech
+            if pending is not None:
+                wait([pending])
+            self._audio_idle.wait()
+            if pending is self._last_speech:
+                return  # Nothing new was requested meanwhile
+    
+    def listen_loop(self):
+        """Start microphone capture, then transcribe and execute commands on the calling thread"""
+        print("Voice Bible System Ready")
+        self.speak_prompt("Application ready. Say 'Bible' to begin.", interruptible=False)
+        self._wait_ready()
+        Thread(target=self._capture_loop, daemon=True).start()
+        self._stt_worker()
+    
+    def _stt_worker(self):
+        """Transcribe captured phrases and execute commands; raises if capture fails"""
+        while True:
+            try:
+                state_name = list(self.states.keys())[self.current_state]
+                print(f"\nCurrent state: {state_name}")
+                
+                # ACTIVE falls back to sleep when nothing is said for a while
+                timeout = 5 if self.current_state == self.states["ACTIVE"] else None
+                try:
+                    audio, barge_in = self._stt_q.get(timeout=timeout)
+                except queue.Empty:
+                    if self._music_active.is_set():
+                        continue  # Still reading; silence is expected
+                    self.current_state = self.states["SLEEP"]
+                    self.speak_prompt("Returning to sleep", interruptible=True)
+                    continue
+                if barge_in is None:
+                    break  # Capture thread died
+                
+                try:
+                    if barge_in:
+                        self._handle_barge_in(audio)
+                    else:
+                        self._handle_audio(audio)
+                finally:
+                    self._stt_q.task_done()
+            
+            except Exception as e:
+                print(f"System error: {e}")
+                self.current_state = self.states["SLEEP"]
+                time.sleep(1)
+        self._raise_capture_error()
+    
+    def _handle_barge_in(self, audio):
+        """Phrase recorded during speech playback: act only on pause/stop, never complain"""
+        try:
+            text = self.transcribe(audio, mode="barge_in")
+        except sr.UnknownValueError:
+            return
+        print(f"Interrupted with: {text}")
+        self.process_command(text)
+    
+    def _handle_audio(self, audio):
+        """Interpret one captured phrase according to the current state"""
+        # SLEEP STATE
+        if self.current_state == self.states["SLEEP"]:
+            try:
+                if audio is not None:
+                    text = self.transcribe(audio, mode="wake")
+                    print(f"Heard: {text}")
+                    if not any(word in text for word in self.wake_words):
+                        return
+                
+                self.current_state = self.states["ACTIVE"]
+                self.speak_prompt("How can I help you?", interruptible=True)
+            
+            except sr.UnknownValueError:
+                return
+        
+        # ACTIVE STATE
+        elif self.current_state == self.states["ACTIVE"]:
+            if audio is None:
+                return  # Late wake marker
+            try:
+                command = self.transcribe(audio, mode="command")
+                print(f"Command: {command}")
+                
+                # Failures already explain themselves ("Verse not found", ...)
+                self.process_command(command)
+            
+            except sr.UnknownValueError:
+                self.signal_failure()
+        
+        # PAUSED STATE
+        elif self.current_state == self.states["PAUSED"]:
+            if audio is None:
+                return
+            try:
+                text = self.transcribe(audio, mode="resume")
+                
+                if any(word in text for word in self._RESUME_WORDS | self.wake_words):
+                    self._on_resume()
+            
+            except sr.UnknownValueError:
+                return
 
 if __name__ == "__main__":
     app = AdvancedVoiceBible()
-    app.speak("Bible application ready", interruptible=False)
+    app.speak_prompt("Bible application ready", interruptible=False)
     app.listen_loop()
\ No newline at end of file